@@ -0,0 +1,53 @@
+"""Benchmark cold start time of main.py, e.g. for cron-triggered runs.
+Times `main.py --help` (parse args only) and the imports needed for a CSV-only run,
+against eagerly importing everything like main.py used to.
+
+Usage: python benchmarks/startup.py [runs]"""
+
+import os
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    "main.py --help": [os.path.join(REPO_DIR, "main.py"), "--help"],
+    "csv-only imports": [
+        "-c",
+        "import main, pandas, format_data, sinks; sinks.load_sinks(['csv'])",
+    ],
+    "eager imports (old main.py)": [
+        "-c",
+        "import pandas, gspread, gspread_dataframe, etherscan, dotenv, format_data",
+    ],
+}
+
+
+def time_run(args, runs):
+    """Best wall time in seconds of a fresh interpreter running args"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            cwd=REPO_DIR,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, args in CASES.items():
+        try:
+            print(f"{name:30} {time_run(args, runs) * 1000:8.1f} ms")
+        except subprocess.CalledProcessError:
+            print(f"{name:30} failed (missing dependencies?)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Integrity checks for query results.
+Catches rows duplicated by skip pagination against a moving index, rows missing
+compared with subgraph-side aggregates, and records a checksum per table so unchanged exports can be skipped"""
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+# Row counts cross-checked against subgraph-side aggregates, per pool:
+# (table, pool column, column) summed per pool should equal
+# (aggregate table, pool id column, aggregate column) for that pool
+AGGREGATE_CHECKS = [
+    ("loans", "pool", "borrowsCount", "pools", "id", "totalBorrowsCount"),
+    ("loans", "pool", "repaysCount", "pools", "id", "totalRepaysCount"),
+]
+
+
+class PageIndex:
+    """Hash index on entity id, built while pages of a query arrive.
+    Subgraph results are ordered by id, so every page should start after the
+    last id of the previous page. If not, rows were inserted ahead of the skip
+    cursor between pages, which shows up as duplicates. Queries are pinned to a
+    block, so this shouldn't happen unless a query loses its block argument.
+    Rows dropping out of the index can't be seen here, see check_aggregates."""
+
+    def __init__(self, query_name):
+        self.query_name = query_name
+        self.ids = set()
+        self.duplicates = 0
+        self.drift = []  # skip values where pages overlapped the previous page
+        self.last_id = None
+
+    def add_page(self, df, skip):
+        """Index a page of results and return it with already seen ids dropped"""
+        if df.empty or "id" not in df.columns:
+            return df
+
+        page_ids = df["id"].tolist()
+        if self.last_id is not None and page_ids[0] <= self.last_id:
+            self.drift.append(skip)
+        self.last_id = page_ids[-1]
+
+        keep = []
+        for entity_id in page_ids:
+            if entity_id in self.ids:
+                keep.append(False)
+            else:
+                self.ids.add(entity_id)
+                keep.append(True)
+
+        duplicates = keep.count(False)
+        if duplicates == 0:
+            return df
+        self.duplicates += duplicates
+        return df[keep]
+
+    def report(self):
+        """Print warnings for duplicates and overlapping pages"""
+        if self.duplicates:
+            print(
+                f"Warning: {self.query_name} returned {self.duplicates} duplicate rows. Duplicates dropped."
+            )
+        if self.drift:
+            print(
+                f"Warning: {self.query_name} pages overlapped at #{', #'.join(map(str, self.drift))}. Index moved during pagination, is the query pinned to a block?"
+            )
+
+
+def check_aggregates(all_results):
+    """Cross-check per-pool row sums against subgraph-side aggregates.
+    Only pools that appear in the table are checked.
+    Mismatches usually mean rows were missed while paginating"""
+    for check in AGGREGATE_CHECKS:
+        table, pool_column, column, aggregate_table, id_column, aggregate_column = check
+        if table not in all_results or aggregate_table not in all_results:
+            continue
+
+        df = all_results[table]
+        aggregate_df = all_results[aggregate_table]
+        if not {pool_column, column} <= set(df.columns):
+            continue
+        if not {id_column, aggregate_column} <= set(aggregate_df.columns):
+            continue
+
+        totals = pd.to_numeric(df[column]).groupby(df[pool_column]).sum()
+        expected = pd.to_numeric(aggregate_df[aggregate_column]).groupby(
+            aggregate_df[id_column]
+        ).sum()
+
+        for pool, total in totals.items():
+            if pool not in expected.index:
+                print(
+                    f"Warning: {table} has rows for pool {pool}, which isn't in {aggregate_table}."
+                )
+            elif total != expected[pool]:
+                print(
+                    f"Warning: pool {pool}: {table}.{column} sums to {total}, but {aggregate_table}.{aggregate_column} is {expected[pool]}. Rows may be missing."
+                )
+
+
+def table_checksum(df):
+    """SHA-256 of the table as it would be exported"""
+    return hashlib.sha256(df.to_csv().encode()).hexdigest()
+
+
+def load_checksums(path):
+    """Load table checksums recorded by the last export, as sink name -> table -> checksum"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checksums(path, checksums):
+    """Record table checksums for the next export"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, "w") as f:
+        json.dump(checksums, f, indent=2, sort_keys=True)
@@ -0,0 +1,67 @@
+"""Derived analytics tables computed from formatted query results.
+Saves spreadsheet users from doing these joins / group-bys in formulas,
+which get unusably slow at Tinlake data sizes"""
+
+import pandas as pd
+
+
+def pool_names(pools):
+    """Pool id -> shortName lookup table"""
+    return pools[["id", "shortName"]].rename(columns={"id": "pool"})
+
+
+def pool_tvl_history(daily_pool_datas, pools):
+    """TVL (reserve + asset value) per pool per day"""
+    df = daily_pool_datas[["day", "pool", "reserve", "assetValue"]].copy()
+    df["tvl"] = df["reserve"] + df["assetValue"]
+    df = df.merge(pool_names(pools), on="pool", how="left")
+    return df.sort_values(["day", "pool"]).reset_index(drop=True)
+
+
+def investor_positions(token_balances, tokens):
+    """Value of each investor's position per token, at current token price"""
+    df = token_balances[["owner", "token", "totalAmount"]].merge(
+        tokens[["id", "symbol", "price"]].rename(columns={"id": "token"}),
+        on="token",
+        how="left",
+    )
+    df["positionValue"] = df["totalAmount"] * df["price"]
+    return df.sort_values(["owner", "token"]).reset_index(drop=True)
+
+
+def debt_by_risk_group(loans, pools):
+    """Outstanding debt and number of loans with debt per pool and risk group"""
+    df = loans[["pool", "riskGroup", "debt"]].copy()
+    df["outstandingLoans"] = df["debt"] > 0
+    # Keep loans without a risk group, so their debt is still counted
+    df = df.groupby(["pool", "riskGroup"], as_index=False, dropna=False).agg(
+        outstandingDebt=("debt", "sum"), outstandingLoans=("outstandingLoans", "sum")
+    )
+    df = df.merge(pool_names(pools), on="pool", how="left")
+    return df.sort_values(["pool", "riskGroup"]).reset_index(drop=True)
+
+
+def derive(all_results):
+    """Compute all derived tables that the fetched results allow.
+    Returns dict of table name -> dataframe, to export alongside all_results"""
+    derived = {}
+
+    if "pools" not in all_results:
+        return derived
+    pools = all_results["pools"]
+
+    if "dailyPoolDatas" in all_results:
+        derived["poolTvlHistory"] = pool_tvl_history(
+            all_results["dailyPoolDatas"], pools
+        )
+
+    # tokenBalances is skipped with --test
+    if "tokenBalances" in all_results and "tokens" in all_results:
+        derived["investorPositions"] = investor_positions(
+            all_results["tokenBalances"], all_results["tokens"]
+        )
+
+    if "loans" in all_results:
+        derived["debtByRiskGroup"] = debt_by_risk_group(all_results["loans"], pools)
+
+    return derived
@@ -9,8 +9,7 @@ def format_decimal(df, columns, places):
     Could automate this, but I like the specific control here.
     Takes list of dataframe column names."""
     for column in columns:
-        df[column] = df[column].astype(float)
-        df[column] = df[column].apply(lambda x: x / 10**places)
+        df[column] = df[column].astype(float) / 10**places
     return df
 
 
@@ -20,6 +19,48 @@ def format_timestamp(df, column):
     return df
 
 
+# Queries whose formatting needs the whole table, so can't be formatted in chunks
+WHOLE_TABLE_QUERIES = {"poolInvestors"}
+
+
+class ChunkedFormatter:
+    """Formats pages of a query in a process pool while later pages are still being fetched.
+    Pages are buffered into chunks of chunk_rows rows, so tiny pages (tokenBalances)
+    don't each pay the cost of being sent to a worker. Queries in WHOLE_TABLE_QUERIES
+    are formatted as a single chunk."""
+
+    def __init__(self, executor, query, chunk_rows=5000):
+        self.executor = executor
+        self.query = query
+        self.chunk_rows = None if query in WHOLE_TABLE_QUERIES else chunk_rows
+        self.buffer = []
+        self.buffered_rows = 0
+        self.futures = []
+
+    def add_page(self, df):
+        if df.empty:
+            return
+        self.buffer.append(df)
+        self.buffered_rows += len(df)
+        if self.chunk_rows and self.buffered_rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        chunk = pd.concat(self.buffer, axis=0, join="outer")
+        self.futures.append(self.executor.submit(formatter, chunk, self.query))
+        self.buffer = []
+        self.buffered_rows = 0
+
+    def result(self):
+        """Wait for all chunks and return the formatted table, in page order"""
+        self.flush()
+        if not self.futures:
+            return formatter(pd.DataFrame(), self.query)
+        return pd.concat([future.result() for future in self.futures], axis=0)
+
+
 # Per-query data formatting logic
 def formatter(df, query):
     if query == "pools":
@@ -1,18 +1,13 @@
 """ Main script to query, format, and export data from Tinlake
 to CSV / Google Sheets Sheets """
 
-import os
 import sys
 import time
-from datetime import datetime
 
-import gspread
-import pandas as pd
-from gspread_dataframe import set_with_dataframe
 from sgqlc.endpoint.http import HTTPEndpoint
 
-import format_data
 import queries
+import sinks
 import utils
 import argparse
 
@@ -25,13 +20,19 @@ def main():
         description="Download human-readable data from Centrifuge Tinlake"
     )
     parser.add_argument(
-        "--csv", "-c", dest="EXPORT_CSV", default=True, help="Export data as CSV?"
+        "--csv",
+        "-c",
+        dest="EXPORT_CSV",
+        default=True,
+        type=utils.str_to_bool,
+        help="Export data as CSV?",
     )
     parser.add_argument(
         "--gsheets",
         "-g",
         dest="EXPORT_GSHEETS",
         default=True,
+        type=utils.str_to_bool,
         help="Export data to gsheets. Note that this requires you to set up credentials, plz see .env.example for more info",
     )
     parser.add_argument(
@@ -42,7 +43,13 @@ def main():
         type=int,
         help="Specify which block to read data from",
     )
-    parser.add_argument("--check-results", "-r", dest="CHECK_RESULTS", default=True)
+    parser.add_argument(
+        "--check-results",
+        "-r",
+        dest="CHECK_RESULTS",
+        default=True,
+        type=utils.str_to_bool,
+    )
     parser.add_argument(
         "--graphurl",
         default="https://api.goldsky.com/api/public/project_clhi43ef5g4rw49zwftsvd2ks/subgraphs/main/prod/gn",
@@ -54,9 +61,82 @@ def main():
         action="store_true",
         help="Skips tokenbalances query, which is slow, so helps with testing",
     )
+    parser.add_argument(
+        "--derived",
+        "-d",
+        dest="DERIVED",
+        default=True,
+        type=utils.str_to_bool,
+        help="Export derived analytics tables (TVL history, investor positions, debt by risk group)",
+    )
+    parser.add_argument(
+        "--daily-balances",
+        dest="DAILY_BALANCES",
+        action="store_true",
+        help="Also export dailyInvestorTokenBalances, which is huge, in sharded CSVs under results/dailyInvestorTokenBalances",
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        dest="WORKERS",
+        default=4,
+        type=int,
+        help="Parallel workers for sharded queries. Workers share one rate limit (--request-interval), so more workers only hide request latency",
+    )
+    parser.add_argument(
+        "--request-interval",
+        dest="REQUEST_INTERVAL",
+        default=0.5,
+        type=float,
+        help="Seconds between requests of sharded queries, shared by all workers. Caps throughput at 1 / interval requests per second",
+    )
+    parser.add_argument(
+        "--format-workers",
+        dest="FORMAT_WORKERS",
+        default=None,
+        type=int,
+        help="Processes formatting results while fetching continues. Defaults to number of CPUs",
+    )
+    parser.add_argument(
+        "--skip-unchanged",
+        "-s",
+        dest="SKIP_UNCHANGED",
+        action="store_true",
+        help="Don't export tables whose checksum matches the last export",
+    )
+    parser.add_argument(
+        "--checksum-file",
+        dest="CHECKSUM_FILE",
+        default="results/checksums.json",
+        help="Where table checksums are recorded between runs",
+    )
     args = parser.parse_args()
 
+    # Shards of dailyInvestorTokenBalances are only written through the CSV sink
+    if args.DAILY_BALANCES and not args.EXPORT_CSV:
+        parser.error(
+            "--daily-balances writes CSV files, so can't be used with --csv False"
+        )
+
+    # Heavy imports are deferred until after arg parsing so --help stays fast
+    from concurrent.futures import ProcessPoolExecutor
+
+    import pandas as pd
+
+    import checks
+    import derived_data
+    import format_data
+    import sharded_fetch
+
+    # Only load the sinks selected on the command line
+    selected_sinks = {"csv": args.EXPORT_CSV, "gsheets": args.EXPORT_GSHEETS}
+    export_sinks = sinks.load_sinks(
+        [name for name, selected in selected_sinks.items() if selected]
+    )
+
     SKIP_LIMIT = 10000000  # How much pagination before we stop
+    FORMAT_CHUNK_ROWS = 5000  # Rows per chunk sent to formatting processes
+    SHARD_DAYS = 30  # Days per pool in each shard of sharded queries
 
     start = time.time()
 
@@ -66,7 +146,7 @@ def main():
     }
     endpoint = HTTPEndpoint(args.GRAPH_URL, headers)
 
-    etherscan_api_key, gsheet_credentials, gsheet_file = utils.load_env_vars()
+    etherscan_api_key = utils.load_etherscan_api_key()
 
     if args.CUSTOM_BLOCK != None:
         print(f"Using custom block: {args.CUSTOM_BLOCK}")
@@ -74,8 +154,19 @@ def main():
     else:
         block = utils.get_subgraph_block(etherscan_api_key, endpoint)
 
+    for sink in export_sinks:
+        sink.open()
+
+    # Sinks can disable themselves on open, e.g. gsheets without credentials
+    export_sinks = [sink for sink in export_sinks if sink.enabled]
+
     # Time to query!
     all_results = {}
+    pending_results = {}
+    page_indexes = {}
+
+    # Formatting runs in worker processes, overlapping with fetching
+    format_executor = ProcessPoolExecutor(max_workers=args.FORMAT_WORKERS)
 
     for key, value in queries.all_queries.items():
         query_name = key
@@ -89,7 +180,9 @@ def main():
         if args.test == True and query_name == "tokenBalances":
             continue
 
-        result = pd.DataFrame()
+        result = format_data.ChunkedFormatter(
+            format_executor, query_name, FORMAT_CHUNK_ROWS
+        )
 
         # Choose how to paginate
         if query_name == "tokenBalances":
@@ -102,6 +195,10 @@ def main():
             first = 1000
             skip = 0
 
+        # Hash index on entity id to catch rows duplicated by pagination drift
+        page_index = checks.PageIndex(query_name)
+        page_indexes[query_name] = page_index
+
         while True:
             time.sleep(0.5)  # Sleep to avoid hitting rate limit on graphql endpoint
             try:
@@ -124,30 +221,68 @@ def main():
                 # Catches poisoned entries in tokenBalances and skips
                 if query_name == "tokenBalances":
                     print("tokenBalances bad data — skipping!")
+                    skip += first
+                    continue
                 else:
                     print(f"Query Error: {result_raw}")
                     sys.exit()
 
             # Add fetched paginated data to full result and increment skip
-            result = pd.concat([result, result_temp], axis=0, join="outer")
+            page_empty = result_temp.empty
+            result_temp = page_index.add_page(result_temp, skip)
+            result.add_page(result_temp)
             if skip < SKIP_LIMIT:
                 skip += first
 
             # See if we are done fetching results
-            if result_temp.empty or skip >= SKIP_LIMIT:
+            if page_empty or skip >= SKIP_LIMIT:
                 print("                                              ", end="\r")
                 print(f"Querying:   {query_name} — Done.", end="\r")
                 break
 
-        # Format results and add to all_results dict
-        result = format_data.formatter(result, query_name)
-        print(f"\rQuerying:   {query_name} — Done. Formatting successful.")
+        # Send off the last chunk. Its formatting carries on while the next query is fetched
+        result.flush()
+        pending_results[query_name] = result
+
+    # Collect formatted results and add to all_results dict
+    for query_name, result in pending_results.items():
+        all_results[query_name] = result.result()
+        print(f"Formatting: {query_name} — Done.")
+
+    format_executor.shutdown()
+
+    # dailyInvestorTokenBalances is too big for one table, so it's fetched
+    # in pool × day shards straight to per-shard CSVs
+    if args.DAILY_BALANCES:
+        shards = sharded_fetch.plan_shards(all_results["dailyPoolDatas"], SHARD_DAYS)
+        shard_page_indexes = sharded_fetch.fetch_sharded(
+            endpoint,
+            "dailyInvestorTokenBalances",
+            block,
+            shards,
+            "results/dailyInvestorTokenBalances",
+            args.WORKERS,
+            args.REQUEST_INTERVAL,
+        )
+        for page_index in shard_page_indexes:
+            page_indexes[page_index.query_name] = page_index
+
+    if args.CHECK_RESULTS:
+        for page_index in page_indexes.values():
+            page_index.report()
+        checks.check_aggregates(all_results)
+
+    # Precompute derived analytics tables, exported alongside query results
+    derived_results = {}
+    if args.DERIVED:
+        derived_results = derived_data.derive(all_results)
+        print(f"Derived tables: {', '.join(derived_results)}")
 
-        all_results[query_name] = result
+    checksums = checks.load_checksums(args.CHECKSUM_FILE)
 
-    for result, result_value in all_results.items():
+    for result, result_value in {**all_results, **derived_results}.items():
         # Test data for potential issues
-        if args.CHECK_RESULTS:
+        if args.CHECK_RESULTS and result in all_results:
             # Test if pagination needed
             if (len(result_value) % 1000) == 0 and len(result_value) > 0:
                 print(
@@ -158,40 +293,28 @@ def main():
             if result_value.empty:
                 print(f"Warning: {result} is empty. Import error?")
 
-        # Save as CSV
-        if args.EXPORT_CSV:
-            if not os.path.exists("results"):
-                os.mkdir("results")
-            result_value.to_csv(f"results/{result}.csv")
+        # Checksums are per sink, so a table is only skipped by sinks that already have it
+        if args.SKIP_UNCHANGED:
+            checksum = checks.table_checksum(result_value)
 
-        # Export to google sheets
-        if args.EXPORT_GSHEETS:
-            # Access google sheet
-            gsheet_service_account = gspread.service_account_from_dict(
-                gsheet_credentials
-            )
-            gsheet_sheet = gsheet_service_account.open_by_key(gsheet_file)
+        for sink in export_sinks:
+            sink_checksums = checksums.setdefault(sink.name, {})
+            if args.SKIP_UNCHANGED and sink_checksums.get(result) == checksum:
+                print(f"{result} unchanged since last {sink.name} export — skipping.")
+                continue
 
-            try:
-                gsheet_sheet.worksheet(result).clear()
-            except gspread.exceptions.WorksheetNotFound:
-                print(f"No existing worksheet found for {result}. Creating new one.")
-                (
-                    rows,
-                    columns,
-                ) = result_value.shape  # get num of rows and columns from dataframe
-                gsheet_sheet.add_worksheet(title=result, rows=rows, cols=columns)
-
-            set_with_dataframe(gsheet_sheet.worksheet(result), result_value)
-            print(f"Imported {result} to Google Sheets")
-            time.sleep(0.5)  # Sleep to avoid hitting rate limit
-
-    # Export time last updated to google sheets
-    if args.EXPORT_GSHEETS:
-        gsheet_sheet.worksheet("Status / Config").update_acell(
-            "B1", str(datetime.now())
-        )
-        print(f"Updated status sheet in Google Sheets")
+            sink.write(result, result_value)
+
+            # Without --skip-unchanged, forget the old checksum rather than hashing
+            if args.SKIP_UNCHANGED:
+                sink_checksums[result] = checksum
+            else:
+                sink_checksums.pop(result, None)
+
+    for sink in export_sinks:
+        sink.close()
+
+    checks.save_checksums(args.CHECKSUM_FILE, checksums)
 
     end = time.time()
     elapsed = end - start
@@ -49,7 +49,7 @@ query ($block: Int!, $first: Int!, $skip: Int!)
     "dailyPoolDatas": """
 query ($block: Int!, $first: Int!, $skip: Int!)
 {
-  dailyPoolDatas(first: $first, skip: $skip)
+  dailyPoolDatas(first: $first, skip: $skip, block:{number: $block})
   {
     id
     day {
@@ -214,13 +214,18 @@ query ($block: Int!, $first: Int!, $skip: Int!)
   """,
 }
 
-# Unused queries:
-# dailyInvestorTokenBalances — dataset returned is huge, so not using for now
-'''
+# Queries too big to paginate in one go. Fetched in shards of pool × day range,
+# see sharded_fetch.py
+sharded_queries = {
     "dailyInvestorTokenBalances": """
-    query ($block: Int!, $first: Int!, $skip: Int!)  
+    query ($block: Int!, $first: Int!, $skip: Int!, $pool: String!, $dayStart: String!, $dayEnd: String!)
     {
-      dailyInvestorTokenBalances(first: $first, skip: $skip)
+      dailyInvestorTokenBalances(
+        first: $first,
+        skip: $skip,
+        block: {number: $block},
+        where: {pool: $pool, day_gte: $dayStart, day_lt: $dayEnd}
+      )
       {
         id
         account {
@@ -243,4 +248,4 @@ query ($block: Int!, $first: Int!, $skip: Int!)
       }
     }
     """,
-'''
+}
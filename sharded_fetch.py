@@ -0,0 +1,212 @@
+"""Sharded, parallel, resumable fetching for queries too big to paginate in one go
+(dailyInvestorTokenBalances). The pool × day keyspace is split into independent
+shards using where: filters. Shards are fetched by parallel workers and written
+to one CSV per shard through the CSV sink, with progress recorded so an interrupted export can resume."""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+import checks
+import format_data
+import queries
+from sinks.csv_sink import CSVSink
+
+SECONDS_PER_DAY = 86400
+MAX_RETRIES = 4  # Retries per page before a shard fails, with exponential backoff
+
+
+class RateLimiter:
+    """Spaces requests from all workers at least interval seconds apart,
+    so parallel shards don't hit the graphql endpoint any harder than one fetch loop"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_request = 0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.next_request > now:
+                time.sleep(self.next_request - now)
+            self.next_request = max(now, self.next_request) + self.interval
+
+
+def plan_shards(daily_pool_datas, shard_days):
+    """Split pool × day keyspace into shards of shard_days days per pool.
+    Uses the days each pool has dailyPoolDatas for.
+    Returns list of (pool, day_start, day_end) with day ids as unix timestamp strings"""
+    shards = []
+    days = daily_pool_datas[["pool", "day"]].copy()
+    days["day"] = days["day"].astype("int64") // 10**9  # datetime -> unix seconds
+
+    for pool, pool_days in days.groupby("pool"):
+        first_day = int(pool_days["day"].min())
+        last_day = int(pool_days["day"].max())
+        for day_start in range(first_day, last_day + 1, shard_days * SECONDS_PER_DAY):
+            day_end = min(
+                day_start + shard_days * SECONDS_PER_DAY, last_day + SECONDS_PER_DAY
+            )
+            shards.append((pool, str(day_start), str(day_end)))
+
+    return shards
+
+
+def shard_key(shard):
+    pool, day_start, day_end = shard
+    return f"{pool}_{day_start}_{day_end}"
+
+
+def load_progress(path, block, shards):
+    """Load progress of an unfinished sharded export. Resuming keeps the block and
+    shard plan the export started with, so all shards come from the same snapshot
+    and no day range is fetched twice under different shard keys"""
+    if os.path.exists(path):
+        with open(path) as f:
+            progress = json.load(f)
+        if not progress["complete"]:
+            print(
+                f"Resuming export at block {progress['block']}, {len(progress['done'])} shards already done."
+            )
+            return progress
+
+    return {
+        "block": block,
+        "complete": False,
+        "shards": [list(shard) for shard in shards],
+        "done": [],
+    }
+
+
+def save_progress(path, progress):
+    with open(path, "w") as f:
+        json.dump(progress, f, indent=2)
+
+
+def request_page(endpoint, query, variables, rate_limiter):
+    """Request one page, retrying with backoff on errors (e.g. rate limits)"""
+    for attempt in range(MAX_RETRIES + 1):
+        rate_limiter.wait()
+        try:
+            result_raw = endpoint(query, variables)
+            if not result_raw.get("errors"):
+                return result_raw
+            error = f"Query Error: {result_raw['errors']}"
+        except Exception as e:
+            error = e
+
+        if attempt < MAX_RETRIES:
+            time.sleep(2**attempt)
+
+    raise RuntimeError(error)
+
+
+def fetch_shard(endpoint, query, query_name, block, shard, sink, rate_limiter):
+    """Paginate through one shard, format it, and write it to sink under its shard key.
+    Returns (shard, number of rows, PageIndex)"""
+    pool, day_start, day_end = shard
+    page_index = checks.PageIndex(f"{query_name} {shard_key(shard)}")
+    result = pd.DataFrame()
+    first = 1000
+    skip = 0
+
+    while True:
+        result_raw = request_page(
+            endpoint,
+            query,
+            {
+                "block": block,
+                "first": first,
+                "skip": skip,
+                "pool": pool,
+                "dayStart": day_start,
+                "dayEnd": day_end,
+            },
+            rate_limiter,
+        )
+
+        result_temp = pd.DataFrame(result_raw["data"][query_name])
+        if result_temp.empty:
+            break
+
+        result_temp = page_index.add_page(result_temp, skip)
+        result = pd.concat([result, result_temp], axis=0, join="outer")
+        skip += first
+
+    if not result.empty:
+        result = format_data.formatter(result, query_name)
+        sink.write(shard_key(shard), result)
+
+    return shard, len(result), page_index
+
+
+def fetch_sharded(
+    endpoint, query_name, block, shards, out_dir, workers, request_interval=0.5
+):
+    """Fetch shards in parallel workers into out_dir/<shard>.csv.
+    An interrupted run is resumed with its own shard plan, skipping shards already done.
+    Returns list of PageIndex per fetched shard, for result checks"""
+    query = queries.sharded_queries[query_name]
+    shard_sink = CSVSink(out_dir)
+    shard_sink.open()
+
+    progress_file = os.path.join(out_dir, "progress.json")
+    progress = load_progress(progress_file, block, shards)
+    shards = [tuple(shard) for shard in progress["shards"]]
+
+    # Starting fresh, so remove shard files from the last export
+    if not progress["done"]:
+        for file in os.listdir(out_dir):
+            if file.endswith(".csv"):
+                os.remove(os.path.join(out_dir, file))
+    done = set(progress["done"])
+    todo = [shard for shard in shards if shard_key(shard) not in done]
+    page_indexes = []
+    failed = []
+    rate_limiter = RateLimiter(request_interval)
+
+    # Network bound, so threads are enough
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                fetch_shard,
+                endpoint,
+                query,
+                query_name,
+                progress["block"],
+                shard,
+                shard_sink,
+                rate_limiter,
+            )
+            for shard in todo
+        ]
+        for future in as_completed(futures):
+            try:
+                shard, rows, page_index = future.result()
+            except Exception as e:
+                failed.append(e)
+                continue
+            page_indexes.append(page_index)
+            progress["done"].append(shard_key(shard))
+            save_progress(progress_file, progress)
+            print(
+                f"Querying:   {query_name} — {len(progress['done'])}/{len(shards)} shards done ({shard_key(shard)}: {rows} rows)",
+                end="\r",
+            )
+
+    if failed:
+        print(
+            f"\n{query_name}: {len(failed)} shards failed, e.g. {failed[0]}. Run again to resume."
+        )
+        return page_indexes
+
+    progress["complete"] = True
+    save_progress(progress_file, progress)
+    print(f"\rQuerying:   {query_name} — Done. {len(shards)} shards in {out_dir}/")
+
+    return page_indexes
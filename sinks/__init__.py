@@ -0,0 +1,39 @@
+"""Export sinks for query results.
+Each sink lives in its own module and is only imported when selected,
+so optional dependencies (gspread etc.) and credentials are only loaded when needed."""
+
+import importlib
+
+# Sink name -> (module, class). Modules are imported lazily by load_sinks()
+SINKS = {
+    "csv": ("sinks.csv_sink", "CSVSink"),
+    "gsheets": ("sinks.gsheets_sink", "GSheetsSink"),
+}
+
+
+class Sink:
+    """Base class for export sinks.
+    open() is called once before any results are written, write() once per
+    query result, close() once after all results are written."""
+
+    name = None
+    enabled = True  # Set to False in open() to skip this sink for the run
+
+    def open(self):
+        pass
+
+    def write(self, result_name, df):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def load_sinks(names):
+    """Import and instantiate the sinks in names, in order"""
+    sinks = []
+    for name in names:
+        module_name, class_name = SINKS[name]
+        module = importlib.import_module(module_name)
+        sinks.append(getattr(module, class_name)())
+    return sinks
@@ -0,0 +1,19 @@
+"""Save query results as CSV files"""
+
+import os
+
+from sinks import Sink
+
+
+class CSVSink(Sink):
+    name = "csv"
+
+    def __init__(self, directory="results"):
+        self.directory = directory
+
+    def open(self):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+    def write(self, result_name, df):
+        df.to_csv(f"{self.directory}/{result_name}.csv")
@@ -0,0 +1,47 @@
+"""Export query results to Google Sheets, one worksheet per result,
+and stamp the last updated time in the status sheet"""
+
+import time
+from datetime import datetime
+
+import gspread
+from gspread_dataframe import set_with_dataframe
+
+import utils
+from sinks import Sink
+
+
+class GSheetsSink(Sink):
+    name = "gsheets"
+
+    def open(self):
+        # Credentials are only read here, so other sinks work without them
+        gsheet_credentials, gsheet_file = utils.load_gsheet_credentials()
+        if not gsheet_credentials or not gsheet_file:
+            print(
+                "No Google Sheets credentials found, skipping Google Sheets export. Plz see .env.example"
+            )
+            self.enabled = False
+            return
+
+        gsheet_service_account = gspread.service_account_from_dict(gsheet_credentials)
+        self.gsheet_sheet = gsheet_service_account.open_by_key(gsheet_file)
+
+    def write(self, result_name, df):
+        try:
+            self.gsheet_sheet.worksheet(result_name).clear()
+        except gspread.exceptions.WorksheetNotFound:
+            print(f"No existing worksheet found for {result_name}. Creating new one.")
+            rows, columns = df.shape  # get num of rows and columns from dataframe
+            self.gsheet_sheet.add_worksheet(title=result_name, rows=rows, cols=columns)
+
+        set_with_dataframe(self.gsheet_sheet.worksheet(result_name), df)
+        print(f"Imported {result_name} to Google Sheets")
+        time.sleep(0.5)  # Sleep to avoid hitting rate limit
+
+    def close(self):
+        # Export time last updated to google sheets
+        self.gsheet_sheet.worksheet("Status / Config").update_acell(
+            "B1", str(datetime.now())
+        )
+        print(f"Updated status sheet in Google Sheets")
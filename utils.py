@@ -1,10 +1,9 @@
 """Utility functions"""
+import functools
 import os
 import sys
 import time
 
-from dotenv import load_dotenv
-from etherscan import Etherscan  # https://github.com/pcko1/etherscan-python
 from sgqlc.endpoint.http import HTTPEndpoint
 
 import queries
@@ -12,84 +11,66 @@ import queries
 # This comment updates github repo so actions work again!
 
 
-def load_env_vars():
-    """Load environment variables from OS or .env file"""
-    for i in range(0, 2):
-        # Try to load OS environment variables
-        if i == 0:
-            etherscan_api_key = os.environ.get("ETHERSCAN_API_KEY")
-            gsheet_file = os.environ.get("GSHEET_FILE")
-
-            gsheet_credentials = {
-                "type": os.environ.get("TYPE"),
-                "project_id": os.environ.get("PROJECT_ID"),
-                "private_key_id": os.environ.get("PRIVATE_KEY_ID"),
-                "private_key": os.environ.get("PRIVATE_KEY"),
-                "client_email": os.environ.get("CLIENT_EMAIL"),
-                "client_id": os.environ.get("CLIENT_ID"),
-                "auth_uri": os.environ.get("AUTH_URI"),
-                "token_uri": os.environ.get("TOKEN_URI"),
-                "auth_provider_x509_cert_url": os.environ.get(
-                    "AUTH_PROVIDER_X509_CERT_URL"
-                ),
-                "client_x509_cert_url": os.environ.get("CLIENT_X509_CERT_URL"),
-            }
-
-            if any(
-                [
-                    etherscan_api_key,
-                    gsheet_file,
-                    all(value == 0 for value in gsheet_credentials.values()),
-                ]
-            ):
-                # Replace escaped newlines in private key
-                gsheet_credentials["private_key"] = gsheet_credentials[
-                    "private_key"
-                ].replace("\\n", "\n")
-                return etherscan_api_key, gsheet_credentials, gsheet_file
-            else:
-                print("No OS environment variables found. Trying with .env file")
-                continue
-
-        elif i == 1:
-            # Try to load .env file
-            load_dotenv()
-            etherscan_api_key = os.getenv("ETHERSCAN_API_KEY")
-            gsheet_file = os.getenv("GSHEET_FILE")
-
-            gsheet_credentials = {
-                "type": os.environ.get("TYPE"),
-                "project_id": os.environ.get("PROJECT_ID"),
-                "private_key_id": os.environ.get("PRIVATE_KEY_ID"),
-                "private_key": os.environ.get("PRIVATE_KEY"),
-                "client_email": os.environ.get("CLIENT_EMAIL"),
-                "client_id": os.environ.get("CLIENT_ID"),
-                "auth_uri": os.environ.get("AUTH_URI"),
-                "token_uri": os.environ.get("TOKEN_URI"),
-                "auth_provider_x509_cert_url": os.environ.get(
-                    "AUTH_PROVIDER_X509_CERT_URL"
-                ),
-                "client_x509_cert_url": os.environ.get("CLIENT_X509_CERT_URL"),
-            }
-
-            if any(
-                [
-                    etherscan_api_key,
-                    gsheet_file,
-                    all(value == 0 for value in gsheet_credentials.values()),
-                ]
-            ):
-                # Replace escaped newlines in private key
-                gsheet_credentials["private_key"] = gsheet_credentials[
-                    "private_key"
-                ].replace("\\n", "\n")
-                return etherscan_api_key, gsheet_credentials, gsheet_file
-            else:
-                print("No valid .env file")
-                etherscan_api_key = False
-                gsheet_credentials = False
-                gsheet_file = False
-                return etherscan_api_key, gsheet_credentials, gsheet_file
+GSHEET_CREDENTIAL_VARS = {
+    "type": "TYPE",
+    "project_id": "PROJECT_ID",
+    "private_key_id": "PRIVATE_KEY_ID",
+    "private_key": "PRIVATE_KEY",
+    "client_email": "CLIENT_EMAIL",
+    "client_id": "CLIENT_ID",
+    "auth_uri": "AUTH_URI",
+    "token_uri": "TOKEN_URI",
+    "auth_provider_x509_cert_url": "AUTH_PROVIDER_X509_CERT_URL",
+    "client_x509_cert_url": "CLIENT_X509_CERT_URL",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def load_dotenv_file():
+    """Load .env file once. OS environment variables take precedence"""
+    from dotenv import load_dotenv
+
+    if not load_dotenv():
+        print("No valid .env file")
+
+
+def get_env_var(name):
+    """Get environment variable from OS, falling back to .env file"""
+    value = os.environ.get(name)
+    if not value:
+        load_dotenv_file()
+        value = os.environ.get(name)
+    return value
+
+
+def load_etherscan_api_key():
+    """Load Etherscan API key from OS or .env file. False if not set"""
+    return get_env_var("ETHERSCAN_API_KEY") or False
+
+
+def load_gsheet_credentials():
+    """Load Google Sheets service account credentials and file ID from OS or .env file.
+    Returns False, False if not set"""
+    gsheet_file = get_env_var("GSHEET_FILE")
+    gsheet_credentials = {
+        key: get_env_var(var) for key, var in GSHEET_CREDENTIAL_VARS.items()
+    }
+
+    if not gsheet_file or not gsheet_credentials["private_key"]:
+        return False, False
+
+    # Replace escaped newlines in private key
+    gsheet_credentials["private_key"] = gsheet_credentials["private_key"].replace(
+        "\\n", "\n"
+    )
+    return gsheet_credentials, gsheet_file
+
+
+def str_to_bool(value):
+    """Parse command line true/false strings, e.g. --csv False"""
+    if isinstance(value, bool):
+        return value
+    return value.lower() in ("true", "t", "yes", "y", "1")
 
 
 def get_subgraph_block(etherscan_api_key: str, endpoint: HTTPEndpoint) -> int:
@@ -109,6 +90,9 @@ def get_subgraph_block(etherscan_api_key: str, endpoint: HTTPEndpoint) -> int:
 
     if etherscan_api_key:
         try:
+            # Only imported when an API key is set
+            from etherscan import Etherscan  # https://github.com/pcko1/etherscan-python
+
             eth = Etherscan(etherscan_api_key)
             etherscan_block = int(
                 eth.get_block_number_by_timestamp(
@@ -131,4 +115,4 @@ def get_subgraph_block(etherscan_api_key: str, endpoint: HTTPEndpoint) -> int:
             )
             print(f"Importing data based on subgraph block: {block}")
 
-        return block
+    return block